@@ -107,8 +107,11 @@ class ASync(object):
         return future.result(timeout)
 
     def run_pending_callbacks(self):
-        while not self._queue.empty():
-            on_done, future = self._queue.get()
+        while True:
+            try:
+                on_done, future = self._queue.get_nowait()
+            except queue.Empty:
+                return
             try:
                 on_done(future)
             except Exception:
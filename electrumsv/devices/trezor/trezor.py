@@ -310,7 +310,7 @@ class TrezorPlugin(HW_PluginBase):
         inputs = []
         for txin in tx.inputs:
             txinputtype = TxInputType()
-            txinputtype.prev_hash = bytes(reversed(txin.prev_hash))
+            txinputtype.prev_hash = txin.prev_hash[::-1]
             txinputtype.prev_index = txin.prev_idx
             txinputtype.sequence = txin.sequence
             txinputtype.amount = txin.value
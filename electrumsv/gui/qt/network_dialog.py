@@ -116,10 +116,10 @@ class NodesListWidget(QTreeWidget):
         prefix = hash_to_hex_str(header.hash).lstrip('00')[0:10]
         return f'{prefix}@{fork_height}'
 
-    def update(self, network):
+    def update(self, network, chains):
+        '''chains is the map returned by network.sessions_by_chain().'''
         self.clear()
         self.addChild = self.addTopLevelItem
-        chains = network.sessions_by_chain()
         our_chain = network.chain()
         for chain, sessions in chains.items():
             if len(chains) > 1:
@@ -389,7 +389,8 @@ class NetworkChoiceLayout(object):
         n = len(self.network.sessions)
         status = _("Connected to {:d} servers.").format(n) if n else _("Not connected")
         self.status_label.setText(status)
-        chains = self.network.sessions_by_chain().keys()
+        # One snapshot for both the split message and the nodes list
+        chains = self.network.sessions_by_chain()
         if len(chains) > 1:
             our_chain = self.network.chain()
             heights = set()
@@ -402,7 +403,7 @@ class NetworkChoiceLayout(object):
         else:
             msg = ''
         self.split_label.setText(msg)
-        self.nodes_list_widget.update(self.network)
+        self.nodes_list_widget.update(self.network, chains)
 
     def fill_in_proxy_settings(self):
         self.filling_in = True
@@ -542,14 +543,13 @@ class TorDetector(QThread):
     @staticmethod
     def is_tor_port(pair):
         try:
-            s = (socket._socketobject if hasattr(socket, "_socketobject")
-                 else socket.socket)(socket.AF_INET, socket.SOCK_STREAM)
-            s.settimeout(0.1)
-            s.connect(pair)
-            # Tor responds uniquely to HTTP-like requests
-            s.send(b"GET\n")
-            if b"Tor is not an HTTP Proxy" in s.recv(1024):
-                return True
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                s.settimeout(0.1)
+                s.connect(pair)
+                # Tor responds uniquely to HTTP-like requests
+                s.send(b"GET\n")
+                if b"Tor is not an HTTP Proxy" in s.recv(1024):
+                    return True
         except socket.error:
             pass
         return False
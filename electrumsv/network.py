@@ -22,24 +22,24 @@
 # CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+from asyncio import shield
 from collections import defaultdict
 from contextlib import suppress
 from enum import IntEnum
-from functools import partial
+from functools import lru_cache, partial
 import os
 import random
-import re
 import ssl
 import stat
 import threading
 import time
-from typing import List
+from typing import Iterable, List
 
 import certifi
 from aiorpcx import (
     connect_rs, RPCSession, Notification, BatchError, RPCError, CancelledError, SOCKSError,
-    TaskTimeout, TaskGroup, handler_invocation, sleep, ignore_after, timeout_after,
-    SOCKS4a, SOCKS5, SOCKSProxy, SOCKSUserAuth
+    TaskTimeout, TaskGroup, handler_invocation, sleep, spawn_sync, ignore_after, timeout_after,
+    SOCKS4a, SOCKS5, SOCKSProxy, SOCKSUserAuth, JSONRPCv2, JSONRPCConnection, ProtocolError
 )
 from bitcoinx import (
     MissingHeader, IncorrectBits, InsufficientPoW, hex_str_to_hash, hash_to_hex_str,
@@ -56,6 +56,12 @@ from .networks import Net
 from .version import PACKAGE_VERSION, PROTOCOL_MIN, PROTOCOL_MAX
 
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
 logger = logs.get_logger("network")
 
 HEADER_SIZE = 80
@@ -66,6 +72,12 @@ REQUEST_MERKLE_PROOF = 'blockchain.transaction.get_merkle'
 SCRIPTHASH_HISTORY = 'blockchain.scripthash.get_history'
 SCRIPTHASH_SUBSCRIBE = 'blockchain.scripthash.subscribe'
 SCRIPTHASH_UNSUBSCRIBE = 'blockchain.scripthash.unsubscribe'
+# Script hash subscriptions and merkle proof requests are sent as JSON RPC batches of at
+# most this many requests
+SCRIPTHASH_SUBSCRIBE_BATCH_SIZE = 100
+MERKLE_PROOF_BATCH_SIZE = 100
+# The most transactions fetched by Network.request_and_wait() that are cached
+TX_HEX_CACHE_SIZE = 256
 BROADCAST_TX_MSG_LIST = (
     ('dust', _('very small "dust" payments')),
     (('Missing inputs', 'Inputs unavailable', 'bad-txns-inputs-spent'),
@@ -86,15 +98,18 @@ BROADCAST_TX_MSG_LIST = (
     ('scriptsig-not-pushonly', _('a scriptsig is not simply data')),
     ('bad-txns-nonfinal', _("transaction is not final"))
 )
+# BROADCAST_TX_MSG_LIST flattened to (in_msg, out_msg) pairs, preserving order
+_BROADCAST_TX_REASONS = tuple(
+    (in_msg, out_msg) for in_msgs, out_msg in BROADCAST_TX_MSG_LIST
+    for in_msg in ((in_msgs, ) if isinstance(in_msgs, str) else in_msgs)
+)
 
 
 def broadcast_failure_reason(exception):
     if isinstance(exception, RPCError):
         msg = exception.message
-        for in_msgs, out_msg in BROADCAST_TX_MSG_LIST:
-            if isinstance(in_msgs, str):
-                in_msgs = (in_msgs, )
-            if any(in_msg in msg for in_msg in in_msgs):
+        for in_msg, out_msg in _BROADCAST_TX_REASONS:
+            if in_msg in msg:
                 return out_msg
     return _('reason unknown')
 
@@ -121,10 +136,18 @@ def _require_string(obj):
     return obj
 
 
+@lru_cache(maxsize=65536)
+def _script_hash(address):
+    '''An address's script hash is its stable subscription key.  Cache it so that
+    resubscribing and unsubscribing do not rebuild and hash the address script each time.'''
+    return scripthash_hex(address)
+
+
 def _history_status(history):
     if not history:
         return None
-    status = ''.join(f'{tx_hash}:{tx_height}:' for tx_hash, tx_height in history)
+    # str.join() materializes a generator into a list first; build the list directly
+    status = ''.join([f'{tx_hash}:{tx_height}:' for tx_hash, tx_height in history])
     return sha256(status.encode()).hex()
 
 
@@ -141,6 +164,27 @@ def _root_from_proof(hash, branch, index):
     return hash
 
 
+class OrJSONRPCv2(JSONRPCv2):
+    '''JSON RPC v2 with messages encoded and decoded by orjson.  orjson works directly in
+    bytes, avoiding the str round trip of the json module on every message.'''
+
+    @classmethod
+    def _message_to_payload(cls, message):
+        try:
+            return orjson.loads(message)
+        except orjson.JSONDecodeError:
+            # orjson also raises this for invalid UTF-8
+            raise cls._error(cls.PARSE_ERROR, 'invalid JSON', True, None)
+
+    @classmethod
+    def encode_payload(cls, payload):
+        try:
+            return orjson.dumps(payload)
+        except orjson.JSONEncodeError:
+            msg = f'JSON payload encoding error: {payload}'
+            raise ProtocolError(cls.INTERNAL_ERROR, msg) from None
+
+
 class DisconnectSessionError(Exception):
 
     def __init__(self, reason, *, blacklist=False):
@@ -158,6 +202,8 @@ class SVServerState:
         self.last_good = 0
         self.last_blacklisted = 0
         self.retry_delay = 0
+        self.peers = []
+        self.last_peers = 0
 
     def can_retry(self, now):
         return not self.is_blacklisted(now) and self.last_try + self.retry_delay < now
@@ -186,7 +232,11 @@ class SVServerState:
 class SVServer:
     '''A smart wrapper around a (host, port, protocol) tuple.'''
 
+    # (host, port, protocol) -> server.  Replaced rather than mutated when a server is added,
+    # so other threads (e.g. the GUI via get_servers()) can iterate it without a lock
     all_servers = {}
+    # Shared by all SSL connections; created on first use
+    _ssl_context = None
 
     def __init__(self, host, port, protocol):
         if not isinstance(host, str) or not host:
@@ -197,7 +247,7 @@ class SVServer:
             raise ValueError(f'unknown protocol: {protocol}')
         key = (host, port, protocol)
         assert key not in SVServer.all_servers
-        SVServer.all_servers[key] = self
+        SVServer.all_servers = {**SVServer.all_servers, key: self}
         # API attributes
         self.host = host
         self.port = port
@@ -219,7 +269,10 @@ class SVServer:
         if self.protocol != 's':
             return None
         # FIXME: implement certificate pinning like Electrum?
-        return ssl.SSLContext(ssl.PROTOCOL_TLS)
+        # The context holds no per-server state, so build it once rather than per connection
+        if SVServer._ssl_context is None:
+            SVServer._ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS)
+        return SVServer._ssl_context
 
     def _connector(self, session_factory, proxy):
         return connect_rs(self.host, self.port, proxy=proxy, session_factory=session_factory,
@@ -310,10 +363,12 @@ class SVProxy(SOCKSProxy):
 
     @classmethod
     def from_string(cls, obj):
-        # Backwards compatibility
+        # Backwards compatibility with the positional 'kind:host:port:username:password'
+        # format.  The password is the remainder of the string so it may contain colons.
         try:
-            kind, host, port, username, password = obj.split(':', 5)
-            return cls((host, port), kind, SVUserAuth(username, password))
+            kind, host, port, username, password = obj.split(':', 4)
+            auth = SVUserAuth(username, password) if username else None
+            return cls(f'{host}:{port}', kind, auth)
         except Exception:
             return None
 
@@ -341,7 +396,8 @@ class SVSession(RPCSession):
     ca_path = certifi.where()
     _connecting_tips = {}
     _need_checkpoint_headers = True
-    # wallet -> list of script hashes.  Also acts as a list of registered wallets
+    # wallet -> script hashes in subscription order, held as the keys of a dict so that
+    # membership tests and removal are O(1).  Also acts as a list of registered wallets
     _subs_by_wallet = {}
     # script_hash -> address
     _address_map = {}
@@ -349,6 +405,8 @@ class SVSession(RPCSession):
     def __init__(self, network, server, logger, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._handlers = {}
+        # (method, args) -> task of the request in flight; see _send_request_shared()
+        self._inflight = {}
         self._network = network
         self._closed_event = app_state.async_.event()
         # These attributes are intended to part of the external API
@@ -369,6 +427,25 @@ class SVSession(RPCSession):
     #             logger.debug(f"send_request({method}, {args}) at {t0} took {td}")
     #             traceback.print_stack()
 
+    async def _send_request_shared(self, method, args):
+        '''Send a request, sharing the response with any identical request already in flight.
+        Only use this for requests whose response cannot change, e.g. fetching a transaction.
+
+        Raises: RPCError, TaskTimeout'''
+        key = (method, tuple(args))
+        task = self._inflight.get(key)
+        if task is None:
+            task = spawn_sync(self.send_request, method, args, report_crash=False)
+            task.add_done_callback(lambda task: self._inflight.pop(key, None))
+            self._inflight[key] = task
+        # Shielded so that one caller timing out does not cancel the request for the others
+        return await shield(task)
+
+    def default_connection(self):
+        if orjson:
+            return JSONRPCConnection(OrJSONRPCv2)
+        return super().default_connection()
+
     @classmethod
     def _required_checkpoint_headers(cls):
         '''Returns (start_height, count).  The range of headers needed for the DAA so that all
@@ -392,18 +469,17 @@ class SVSession(RPCSession):
     @classmethod
     def _connect_header(cls, height, raw_header):
         '''It is assumed that if height is <= the checkpoint height then the header has
-        been checked for validity.
+        been checked for validity.  Flushing the headers file is left to the caller, so
+        that a batch of headers costs a single flush.
         '''
         headers_obj = app_state.headers
-        checkpoint = headers_obj.checkpoint
 
-        if height <= checkpoint.height:
+        if height <= headers_obj.checkpoint.height:
             headers_obj.set_one(height, raw_header)
-            headers_obj.flush()
-            header = Net.COIN.deserialized_header(raw_header, height)
+            header = headers_obj.coin.deserialized_header(raw_header, height)
             return header, headers_obj.longest_chain()
         else:
-            return app_state.headers.connect(raw_header)
+            return headers_obj.connect(raw_header)
 
     @classmethod
     def _connect_chunk(cls, start_height, raw_chunk):
@@ -530,8 +606,8 @@ class SVSession(RPCSession):
         if hex_root != expected_root:
             raise DisconnectSessionError(f'bad header merkle root {hex_root} expected '
                                          f'{expected_root}', blacklist=True)
-        header = Net.COIN.deserialized_header(raw_header, height)
-        proven_root = hash_to_hex_str(_root_from_proof(header.hash, branch, height))
+        header_hash = Net.COIN.header_hash(raw_header)
+        proven_root = hash_to_hex_str(_root_from_proof(header_hash, branch, height))
         if proven_root != expected_root:
             raise DisconnectSessionError(f'invalid header proof {proven_root} expected '
                                          f'{expected_root}', blacklist=True)
@@ -599,10 +675,29 @@ class SVSession(RPCSession):
         while height < tip.height:
             height = await self._request_chunk(height + 1, 2016)
 
-    async def _subscribe_to_script_hash(self, script_hash: str) -> None:
-        '''Raises: RPCError, TaskTimeout'''
-        status = await self.send_request(SCRIPTHASH_SUBSCRIBE, [script_hash])
-        await self._on_status_changed(script_hash, status)
+    async def _subscribe_to_script_hashes(self, script_hashes: List[str]) -> None:
+        '''Subscribe to the script hashes with a single batch request, so they are written to
+        the transport together rather than one message at a time.  A failed subscription or
+        status change is logged, and does not affect the others in the batch.
+
+        Raises: TaskTimeout'''
+        async with self.send_batch() as batch:
+            for script_hash in script_hashes:
+                batch.add_request(SCRIPTHASH_SUBSCRIBE, [script_hash])
+        async with TaskGroup() as group:
+            tasks = {}
+            for script_hash, status in zip(script_hashes, batch.results):
+                if isinstance(status, Exception):
+                    self.logger.error(f'subscribing to {script_hash}: {status}')
+                else:
+                    tasks[await group.spawn(self._on_status_changed(script_hash, status))] = \
+                        script_hash
+
+            while tasks:
+                task = await group.next_done()
+                script_hash = tasks.pop(task)
+                if not task.cancelled() and task.exception():
+                    self.logger.error(f'status change of {script_hash}: {task.exception()}')
 
     async def _unsubscribe_from_script_hash(self, script_hash: str) -> bool:
         return await self.send_request(SCRIPTHASH_UNSUBSCRIBE, [script_hash])
@@ -643,16 +738,21 @@ class SVSession(RPCSession):
 
     async def _main_server_batch(self):
         '''Raises: DisconnectSessionError, BatchError, TaskTimeout'''
+        server = self.server
+        # A server's peer list changes slowly; only request and parse it once a day
+        want_peers = server.state.last_peers < time.time() - ONE_DAY
         async with timeout_after(10):
             async with self.send_batch(raise_errors=True) as batch:
                 batch.add_request('server.banner')
                 batch.add_request('server.donation_address')
-                batch.add_request('server.peers.subscribe')
-        server = self.server
+                if want_peers:
+                    batch.add_request('server.peers.subscribe')
         try:
             server.state.banner = _require_string(batch.results[0])
             server.state.donation_address = _require_string(batch.results[1])
-            server.state.peers = self._parse_peers_subscribe(batch.results[2])
+            if want_peers:
+                server.state.peers = self._parse_peers_subscribe(batch.results[2])
+                server.state.last_peers = time.time()
             self._network.trigger_callback('banner')
         except AssertionError as e:
             raise DisconnectSessionError(f'main server requests bad batch response: {e}')
@@ -663,8 +763,10 @@ class SVSession(RPCSession):
             host_details = _require_list(host_details)
             host = _require_string(host_details[1])
             for v in host_details[2]:
-                if re.match(r"[st]\d*", _require_string(v)):
-                    protocol, port = v[0], v[1:]
+                # Features are single-letter tagged; only s and t carry a port
+                protocol = _require_string(v)[:1]
+                if protocol in ('s', 't'):
+                    port = v[1:]
                     try:
                         peers.append(SVServer.unique(host, port, protocol))
                     except ValueError:
@@ -707,6 +809,8 @@ class SVSession(RPCSession):
                              f'hash {hex_str} last good {good_height:,d}')
         except (AssertionError, KeyError, TypeError, ValueError) as e:
             raise DisconnectSessionError(f'bad {method} response: {e}')
+        finally:
+            app_state.headers.flush()
 
         if good_height < min_good_height:
             raise DisconnectSessionError(f'cannot connect to checkpoint', blacklist=True)
@@ -766,7 +870,7 @@ class SVSession(RPCSession):
 
     async def subscribe_wallet(self, wallet, pairs=None):
         if pairs is None:
-            pairs = [(address, scripthash_hex(address))
+            pairs = [(address, _script_hash(address))
                 for address in wallet.get_observed_addresses()]
             self.logger.info(f'subscribing to {len(pairs):,d} observed addresses for {wallet}')
         else:
@@ -786,7 +890,7 @@ class SVSession(RPCSession):
         subs_by_wallet = self._subs_by_wallet
         address_map = self._address_map
         SVSession._address_map = {}
-        SVSession._subs_by_wallet = {wallet: [] for wallet in subs_by_wallet}
+        SVSession._subs_by_wallet = {wallet: {} for wallet in subs_by_wallet}
 
         async with TaskGroup() as group:
             for wallet in list(subs_by_wallet):
@@ -811,11 +915,17 @@ class SVSession(RPCSession):
 
     async def request_tx(self, tx_hash):
         '''Raises: RPCError, TaskTimeout'''
-        return await self.send_request('blockchain.transaction.get', [tx_hash])
+        return await self._send_request_shared('blockchain.transaction.get', [tx_hash])
 
-    async def request_proof(self, *args):
-        '''Raises: RPCError, TaskTimeout'''
-        return await self.send_request(REQUEST_MERKLE_PROOF, args)
+    async def request_proofs(self, pairs):
+        '''Request the proofs of (tx_hash, tx_height) pairs as a single batch.  The result of a
+        failed request is its exception.
+
+        Raises: TaskTimeout'''
+        async with self.send_batch() as batch:
+            for tx_hash, tx_height in pairs:
+                batch.add_request(REQUEST_MERKLE_PROOF, (tx_hash, tx_height))
+        return batch.results
 
     async def request_history(self, script_hash):
         '''Raises: RPCError, TaskTimeout'''
@@ -828,24 +938,35 @@ class SVSession(RPCSession):
         # Set notification handler
         self._handlers[SCRIPTHASH_SUBSCRIBE] = self._on_status_changed
         if wallet not in self._subs_by_wallet:
-            self._subs_by_wallet[wallet] = []
+            self._subs_by_wallet[wallet] = {}
         # Take reference so wallet can be unsubscribed asynchronously without conflict
         subs = self._subs_by_wallet[wallet]
+        script_hashes = []
+        for address, script_hash in pairs:
+            # A wallet shouldn't be subscribing the same address twice
+            assert script_hash not in subs, f'{address} subscribed twice'
+            subs[script_hash] = None
+            # Send request even if already subscribed, as our user expects a response
+            # to trigger other actions and won't get one if we swallow it.
+            self._address_map[script_hash] = address
+            script_hashes.append(script_hash)
+
         async with TaskGroup() as group:
-            wallet.request_count += len(pairs)
+            wallet.request_count += len(script_hashes)
             wallet.progress_event.set()
-            for address, script_hash in pairs:
-                subs.append(script_hash)
-                # Send request even if already subscribed, as our user expects a response
-                # to trigger other actions and won't get one if we swallow it.
-                self._address_map[script_hash] = address
-                await group.spawn(self._subscribe_to_script_hash(script_hash))
+            tasks = {}
+            for n in range(0, len(script_hashes), SCRIPTHASH_SUBSCRIBE_BATCH_SIZE):
+                batch = script_hashes[n: n + SCRIPTHASH_SUBSCRIBE_BATCH_SIZE]
+                tasks[await group.spawn(self._subscribe_to_script_hashes(batch))] = len(batch)
 
-            while await group.next_done():
-                wallet.response_count += 1
+            while tasks:
+                task = await group.next_done()
+                count = tasks.pop(task)
+                wallet.response_count += count
                 wallet.progress_event.set()
-        # A wallet shouldn't be subscribing the same address twice
-        assert len(set(subs)) == len(subs)
+                if not task.cancelled() and task.exception():
+                    self.logger.error(f'subscribing to {count:,d} script hashes: '
+                                      f'{task.exception()}')
 
     async def unsubscribe_from_pairs(self, wallet, pairs) -> None:
         '''pairs is an iterable of (address, script_hash) pairs.
@@ -860,12 +981,12 @@ class SVSession(RPCSession):
                 # Blocking on each removal allows for race conditions.
                 if script_hash not in subs:
                     continue
-                subs.remove(script_hash)
+                del subs[script_hash]
                 del self._address_map[script_hash]
                 await group.spawn(self._unsubscribe_from_script_hash(script_hash))
 
     @classmethod
-    def _get_exclusive_set(cls, wallet, subs: List[str]) -> set:
+    def _get_exclusive_set(cls, wallet, subs: Iterable[str]) -> set:
         # This returns the script hashes the given wallet is subscribed to, that no other
         # wallet is also subscribed to. This ensures that when we unsubscribe script hashes for
         # the given wallet, as the server subscription is shared between wallets, we only
@@ -874,7 +995,7 @@ class SVSession(RPCSession):
         for other_wallet, other_subs in cls._subs_by_wallet.items():
             if other_wallet == wallet:
                 continue
-            subs_set -= set(other_subs)
+            subs_set.difference_update(other_subs)
         return subs_set
 
     @classmethod
@@ -906,11 +1027,14 @@ class Network:
     def __init__(self):
         app_state.read_headers()
 
-        # Sessions
-        self.sessions = []
+        # Sessions.  A tuple replaced on every change, so other threads (e.g. the GUI) can
+        # iterate it without a lock
+        self.sessions = ()
         self.chosen_servers = set()
         self.main_server = None
         self.proxy = None
+        # protocol -> (server count, frozenset of known servers with that protocol)
+        self._servers_by_protocol = {}
 
         # Events
         self.sessions_changed_event = app_state.async_.event()
@@ -921,10 +1045,15 @@ class Network:
         # Add a wallet, remove a wallet, or redo all wallet verifications
         self.wallet_jobs = app_state.async_.queue()
 
-        # Callbacks and their lock
-        self.callbacks = defaultdict(list)
+        # Callbacks and their lock.  Each event maps to a tuple of callbacks that writers
+        # replace under the lock, so triggering can use it as a snapshot without copying
+        self.callbacks = defaultdict(tuple)
         self.lock = threading.Lock()
 
+        # tx_hash -> hex of transactions fetched by request_and_wait(), oldest first
+        self._tx_hex_cache = {}
+        self._tx_hex_cache_lock = threading.Lock()
+
         dir_path = app_state.config.file_path('certs')
         if not os.path.exists(dir_path):
             os.mkdir(dir_path)
@@ -991,13 +1120,16 @@ class Network:
 
     async def _maybe_switch_main_server(self, reason):
         now = time.time()
-        max_height = max((session.tip.height for session in self.sessions), default=0)
-        for session in self.sessions:
+        sessions = self.sessions
+        max_height = max((session.tip.height for session in sessions), default=0)
+        good_servers = []
+        for session in sessions:
+            server = session.server
             if session.tip.height > max_height - 2:
-                session.server.state.last_good = now
-        # Give a 60-second breather for a lagging server to catch up
-        good_servers = [session.server for session in self.sessions
-                        if session.server.state.last_good > now - 60]
+                server.state.last_good = now
+            # Give a 60-second breather for a lagging server to catch up
+            if server.state.last_good > now - 60:
+                good_servers.append(server)
         if not good_servers:
             logger.warning(f'no good servers available')
         elif self.main_server not in good_servers:
@@ -1038,6 +1170,10 @@ class Network:
         main_chain = None
         while True:
             await self.check_main_chain_event.wait()
+            # Each session sets the event as it connects its tip, and on a new block they all
+            # do so within moments of each other.  Let the burst settle so the GUI and
+            # wallets are notified once rather than once per session.
+            await sleep(0.25)
             self.check_main_chain_event.clear()
             main_session = await self._main_session()
             new_main_chain = main_session.chain
@@ -1069,8 +1205,9 @@ class Network:
         self.trigger_callback('status')
 
     def _read_config(self):
-        # Remove obsolete key
-        app_state.config.set_key('server_blacklist', None)
+        # Remove obsolete key.  Only if present, as set_key() rewrites the config file
+        if app_state.config.get('server_blacklist') is not None:
+            app_state.config.set_key('server_blacklist', None)
         count = len(SVServer.all_servers)
         logger.info(f'read {count:,d} servers from config file')
         if count < 5:
@@ -1130,14 +1267,31 @@ class Network:
                     self.trigger_callback('new_transaction', tx, wallet)
         return had_timeout
 
+    def _protocol_servers(self, protocol):
+        '''Returns a frozenset of the known servers using protocol.  Servers are never removed
+        from SVServer.all_servers so a cached set remains valid until the count changes.'''
+        count = len(SVServer.all_servers)
+        cached = self._servers_by_protocol.get(protocol)
+        if cached is None or cached[0] != count:
+            servers = frozenset(server for server in SVServer.all_servers.values()
+                                if server.protocol == protocol)
+            cached = self._servers_by_protocol[protocol] = (count, servers)
+        return cached[1]
+
     def _available_servers(self, protocol):
+        '''Generates the servers using protocol that are not chosen and can be retried.'''
         now = time.time()
-        unchosen = set(SVServer.all_servers.values()).difference(self.chosen_servers)
-        return [server for server in unchosen
-                if server.protocol == protocol and server.state.can_retry(now)]
+        chosen_servers = self.chosen_servers
+        return (server for server in self._protocol_servers(protocol)
+                if server not in chosen_servers and server.state.can_retry(now))
 
     def _random_server_nowait(self, protocol):
-        servers = self._available_servers(protocol)
+        # Servers that were good in the last day are preferred, so that a cold start
+        # connects to warm servers rather than probing dead ones.
+        cutoff = time.time() - ONE_DAY
+        servers = tuple(self._available_servers(protocol))
+        warm_servers = [server for server in servers if server.state.last_good > cutoff]
+        servers = warm_servers or servers
         return random.choice(servers) if servers else None
 
     async def _random_server(self, protocol):
@@ -1154,27 +1308,37 @@ class Network:
         had_timeout = False
         session = await self._main_session()
         session.logger.debug(f'requesting {len(wanted_map)} proofs')
+        wanted = list(wanted_map.items())
         async with TaskGroup() as group:
             tasks = {}
-            for tx_hash, tx_height in wanted_map.items():
-                tasks[await group.spawn(session.request_proof(tx_hash, tx_height))] = tx_hash
+            for n in range(0, len(wanted), MERKLE_PROOF_BATCH_SIZE):
+                pairs = wanted[n: n + MERKLE_PROOF_BATCH_SIZE]
+                tasks[await group.spawn(session.request_proofs(pairs))] = pairs
             headers = await session.headers_at_heights(wanted_map.values())
 
             while tasks:
                 task = await group.next_done()
-                tx_hash = tasks.pop(task)
-                tx_height = wanted_map[tx_hash]
+                pairs = tasks.pop(task)
                 try:
-                    result = task.result()
-                    branch = [hex_str_to_hash(item) for item in result['merkle']]
-                    tx_pos = result['pos']
-                    proven_root = _root_from_proof(hex_str_to_hash(tx_hash), branch, tx_pos)
-                    header = headers[wanted_map[tx_hash]]
+                    results = task.result()
                 except CancelledError:
                     had_timeout = True
+                    continue
                 except Exception as e:
-                    logger.error(f'getting proof for {tx_hash}: {e}')
-                else:
+                    logger.error(f'getting {len(pairs):,d} proofs: {e}')
+                    continue
+
+                for (tx_hash, tx_height), result in zip(pairs, results):
+                    try:
+                        if isinstance(result, Exception):
+                            raise result
+                        branch = [hex_str_to_hash(item) for item in result['merkle']]
+                        tx_pos = result['pos']
+                        proven_root = _root_from_proof(hex_str_to_hash(tx_hash), branch, tx_pos)
+                        header = headers[tx_height]
+                    except Exception as e:
+                        logger.error(f'getting proof for {tx_hash}: {e}')
+                        continue
                     if header.merkle_root == proven_root:
                         logger.debug(f'received valid proof for {tx_hash}')
                         wallet.add_verified_tx(tx_hash,
@@ -1207,7 +1371,7 @@ class Network:
             session = await self._main_session()
             session.logger.info(f'subscribing to {len(addresses):,d} new addresses for {wallet}')
             # Do in reverse to require fewer wallet re-sync loops
-            pairs = [(address, scripthash_hex(address)) for address in addresses]
+            pairs = [(address, _script_hash(address)) for address in addresses]
             pairs.reverse()
             await session.subscribe_to_pairs(wallet, pairs)
             addresses = await wallet.new_addresses()
@@ -1224,7 +1388,7 @@ class Network:
             else:
                 session.logger.info(f'unsubscribing from {len(addresses):,d} '+
                     f'used addresses for {wallet}')
-            pairs = [(address, scripthash_hex(address)) for address in addresses]
+            pairs = [(address, _script_hash(address)) for address in addresses]
             await session.unsubscribe_from_pairs(wallet, pairs)
 
     async def _maintain_wallet(self, wallet):
@@ -1265,7 +1429,7 @@ class Network:
     #
 
     async def session_established(self, session):
-        self.sessions.append(session)
+        self.sessions += (session, )
         self.sessions_changed_event.set()
         self.sessions_changed_event.clear()
         self.trigger_callback('sessions')
@@ -1275,7 +1439,7 @@ class Network:
         return False
 
     async def session_closed(self, session):
-        self.sessions.remove(session)
+        self.sessions = tuple(item for item in self.sessions if item is not session)
         self.sessions_changed_event.set()
         self.sessions_changed_event.clear()
         if session.server is self.main_server:
@@ -1317,18 +1481,19 @@ class Network:
     def register_callback(self, callback, events):
         with self.lock:
             for event in events:
-                self.callbacks[event].append(callback)
+                self.callbacks[event] += (callback, )
 
     def unregister_callback(self, callback):
         with self.lock:
-            for callbacks in self.callbacks.values():
+            for event, callbacks in self.callbacks.items():
                 if callback in callbacks:
-                    callbacks.remove(callback)
+                    index = callbacks.index(callback)
+                    self.callbacks[event] = callbacks[:index] + callbacks[index + 1:]
 
     def trigger_callback(self, event, *args):
-        with self.lock:
-            callbacks = self.callbacks[event][:]
-        [callback(event, *args) for callback in callbacks]
+        # Use get() so that reading without the lock never inserts into the dictionary
+        for callback in self.callbacks.get(event, ()):
+            callback(event, *args)
 
     def chain(self):
         main_session = self.main_session()
@@ -1384,12 +1549,35 @@ class Network:
 
     # FIXME: this should be removed; its callers need to be fixed
     def request_and_wait(self, method, args):
+        if method == 'blockchain.transaction.get' and len(args) == 1:
+            return self._request_tx_and_wait(args[0])
+        return self._request_and_wait(method, args)
+
+    def _request_and_wait(self, method, args):
         async def send_request():
             session = await self._main_session()
             return await session.send_request(method, args)
 
         return app_state.async_.spawn_and_wait(send_request)
 
+    def _request_tx_and_wait(self, tx_hash):
+        '''Transactions never change, so fetched ones are cached once checked to be the
+        transaction asked for.  Failures raise, so are not cached.'''
+        tx_hex = self._tx_hex_cache.get(tx_hash)
+        if tx_hex is None:
+            tx_hex = self._request_and_wait('blockchain.transaction.get', [tx_hash])
+            try:
+                is_good = Transaction.from_hex(tx_hex).txid() == tx_hash
+            except Exception:
+                is_good = False
+            if is_good:
+                with self._tx_hex_cache_lock:
+                    if len(self._tx_hex_cache) >= TX_HEX_CACHE_SIZE:
+                        # Evict the oldest entry
+                        del self._tx_hex_cache[next(iter(self._tx_hex_cache))]
+                    self._tx_hex_cache[tx_hash] = tx_hex
+        return tx_hex
+
     def get_utxos(self, script_hash):
         return self.request_and_wait('blockchain.scripthash.listunspent', [script_hash])
 
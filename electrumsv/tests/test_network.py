@@ -0,0 +1,280 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from aiorpcx import BatchError, JSONRPCv2, ProtocolError, RPCError, TaskTimeout
+from bitcoinx import hash_to_hex_str, hex_str_to_hash
+import pytest
+
+from electrumsv import network as network_module
+from electrumsv.logs import logs
+from electrumsv.tests.test_transaction import signed_blob
+from electrumsv.transaction import Transaction
+from electrumsv.network import (
+    _root_from_proof, broadcast_failure_reason, Network, orjson, OrJSONRPCv2, SVProxy, SVServer,
+    SVSession
+)
+
+
+def _parse_peers(result):
+    session = SimpleNamespace(logger=logs.get_logger('test_network'))
+    return SVSession._parse_peers_subscribe(session, result)
+
+
+def test_parse_peers_subscribe():
+    result = [
+        ['1.2.3.4', 'peers1.test', ['v1.4', 's50002', 't50001', 'p10000']],
+        ['5.6.7.8', 'peers2.test', ['v1.4', 't', 'x50001']],
+    ]
+    peers = _parse_peers(result)
+    assert peers == [
+        SVServer.unique('peers1.test', 50002, 's'),
+        SVServer.unique('peers1.test', 50001, 't'),
+    ]
+
+
+def test_parse_peers_subscribe_bad_result():
+    with pytest.raises(AssertionError):
+        _parse_peers([['1.2.3.4', 'peers3.test', [50002]]])
+
+
+@pytest.mark.skipif(orjson is None, reason='orjson is not installed')
+def test_orjson_rpc_round_trip():
+    payload = {'jsonrpc': '2.0', 'id': 3, 'method': 'server.version', 'params': ['a', 'b']}
+    message = OrJSONRPCv2.encode_payload(payload)
+    assert isinstance(message, bytes)
+    assert OrJSONRPCv2._message_to_payload(message) == payload
+    assert OrJSONRPCv2._message_to_payload(message) == JSONRPCv2._message_to_payload(message)
+
+
+@pytest.mark.skipif(orjson is None, reason='orjson is not installed')
+def test_orjson_rpc_errors():
+    with pytest.raises(ProtocolError) as e:
+        OrJSONRPCv2._message_to_payload(b'{"id": ')
+    assert e.value.code == JSONRPCv2.PARSE_ERROR
+    with pytest.raises(ProtocolError) as e:
+        OrJSONRPCv2._message_to_payload(b'"\xff"')
+    assert e.value.code == JSONRPCv2.PARSE_ERROR
+    with pytest.raises(ProtocolError) as e:
+        OrJSONRPCv2.encode_payload({'params': [object()]})
+    assert e.value.code == JSONRPCv2.INTERNAL_ERROR
+
+
+def test_proxy_from_string():
+    proxy = SVProxy.from_string('socks5:localhost:9050:user:pass:word')
+    assert proxy.kind() == 'SOCKS5'
+    assert (proxy.host(), proxy.port()) == ('localhost', 9050)
+    assert (proxy.username(), proxy.password()) == ('user', 'pass:word')
+
+    proxy = SVProxy.from_string('socks4:127.0.0.1:9150::')
+    assert proxy.kind() == 'SOCKS4'
+    assert proxy.auth is None
+
+    assert SVProxy.from_string('http:localhost:8080::') is None
+    assert SVProxy.from_string('socks5:localhost') is None
+
+
+def test_request_tx_shares_inflight_request():
+    calls = []
+
+    async def send_request(method, args):
+        calls.append((method, args))
+        await asyncio.sleep(0.01)
+        return 'tx_hex'
+
+    async def main():
+        session = SVSession.__new__(SVSession)
+        session._inflight = {}
+        session.send_request = send_request
+        results = await asyncio.gather(session.request_tx('aa'), session.request_tx('aa'),
+                                       session.request_tx('bb'))
+        assert results == ['tx_hex'] * 3
+        assert not session._inflight
+        # Once answered, a later identical request is sent again
+        await session.request_tx('aa')
+
+    asyncio.get_event_loop().run_until_complete(main())
+    assert calls == [('blockchain.transaction.get', ['aa']),
+                     ('blockchain.transaction.get', ['bb']),
+                     ('blockchain.transaction.get', ['aa'])]
+
+
+@pytest.mark.parametrize("message, reason", (
+    ('64: dust', 'very small "dust" payments'),
+    ('Missing inputs', 'missing, already-spent, or otherwise invalid coins'),
+    ('258: txn-mempool-conflict', "it conflicts with one already in the server's mempool"),
+    ('the transaction was rejected by network rules.\n\n'
+     '16: mandatory-script-verify-flag-failed', 'reason unknown'),
+))
+def test_broadcast_failure_reason(message, reason):
+    assert broadcast_failure_reason(RPCError(1, message)) == reason
+
+
+def test_broadcast_failure_reason_not_rpc_error():
+    assert broadcast_failure_reason(OSError('dust')) == 'reason unknown'
+
+
+def test_server_registry_copy_on_write():
+    servers = SVServer.all_servers.values()
+    count = len(servers)
+    server = SVServer.unique('cow.test', 50002, 's')
+    # A view taken before the addition is unaffected by it
+    assert len(servers) == count
+    assert server not in servers
+    assert SVServer.all_servers[('cow.test', 50002, 's')] is server
+    assert SVServer.unique('cow.test', '50002', 's') is server
+
+
+def test_request_and_wait_caches_transactions(monkeypatch):
+    monkeypatch.setattr(network_module, 'TX_HEX_CACHE_SIZE', 2)
+    # Vary the locktime for distinct transactions
+    blobs = [signed_blob[:-8] + f'{n:02x}000000' for n in range(3)]
+    tx_hash, other_hash, third_hash = (Transaction.from_hex(blob).txid() for blob in blobs)
+    responses = {tx_hash: blobs[0], other_hash: blobs[1], third_hash: blobs[2],
+                 'dd' * 32: blobs[0]}
+    calls = []
+
+    def request_and_wait(method, args):
+        calls.append((method, args))
+        if method == 'blockchain.transaction.get':
+            if args[0] == 'bad':
+                raise RPCError(2, 'no such transaction')
+            return responses[args[0]]
+        return 'result'
+
+    network = Network.__new__(Network)
+    network._tx_hex_cache = {}
+    network._tx_hex_cache_lock = threading.Lock()
+    network._request_and_wait = request_and_wait
+
+    def request_tx(tx_hash):
+        return network.request_and_wait('blockchain.transaction.get', [tx_hash])
+
+    for _ in range(2):
+        assert request_tx(tx_hash) == blobs[0]
+        assert network.request_and_wait('blockchain.transaction.broadcast', ['cc']) == 'result'
+        with pytest.raises(RPCError):
+            request_tx('bad')
+        # The wrong transaction for the hash is returned but not cached
+        assert request_tx('dd' * 32) == blobs[0]
+    uncached = [
+        ('blockchain.transaction.broadcast', ['cc']),
+        ('blockchain.transaction.get', ['bad']),
+        ('blockchain.transaction.get', ['dd' * 32]),
+    ]
+    assert calls == [('blockchain.transaction.get', [tx_hash])] + uncached * 2
+    assert list(network._tx_hex_cache) == [tx_hash]
+
+    # The oldest entry is evicted once the cache is full
+    request_tx(other_hash)
+    request_tx(third_hash)
+    del calls[:]
+    request_tx(other_hash)
+    request_tx(tx_hash)
+    assert calls == [('blockchain.transaction.get', [tx_hash])]
+
+
+class _StubBatch:
+    '''Stands in for aiorpcx's BatchRequest, answering each request with respond().'''
+
+    def __init__(self, respond, raise_errors):
+        self.requests = []
+        self.results = None
+        self._respond = respond
+        self._raise_errors = raise_errors
+
+    def add_request(self, method, args=()):
+        self.requests.append((method, args))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.results = tuple(self._respond(*request) for request in self.requests)
+        if self._raise_errors and any(isinstance(item, Exception) for item in self.results):
+            raise BatchError(self)
+
+
+class _StubWallet:
+
+    def __init__(self):
+        self.request_count = 0
+        self.response_count = 0
+        self.progress_event = SimpleNamespace(set=lambda: None)
+
+
+def test_subscribe_to_pairs_isolates_failures():
+    def respond(method, args):
+        script_hash = args[0]
+        assert method == 'blockchain.scripthash.subscribe'
+        if script_hash == 'sh2':
+            return RPCError(1, 'subscription failed')
+        return f'status of {script_hash}'
+
+    statuses = []
+
+    async def on_status_changed(script_hash, status):
+        if script_hash == 'sh3':
+            raise ValueError('bad history')
+        statuses.append((script_hash, status))
+
+    session = SVSession.__new__(SVSession)
+    session.logger = logs.get_logger('test_network')
+    session._handlers = {}
+    session._subs_by_wallet = {}
+    session._address_map = {}
+    session.send_batch = lambda raise_errors=False: _StubBatch(respond, raise_errors)
+    session._on_status_changed = on_status_changed
+    wallet = _StubWallet()
+    pairs = [(f'address{n}', f'sh{n}') for n in range(5)]
+
+    asyncio.get_event_loop().run_until_complete(session.subscribe_to_pairs(wallet, pairs))
+    # Only the failed subscription and the failed status change are lost
+    assert sorted(statuses) == [('sh0', 'status of sh0'), ('sh1', 'status of sh1'),
+                                ('sh4', 'status of sh4')]
+    assert wallet.request_count == wallet.response_count == 5
+    assert list(session._subs_by_wallet[wallet]) == [sh for _address, sh in pairs]
+
+
+def test_request_proofs(monkeypatch):
+    monkeypatch.setattr(network_module, 'MERKLE_PROOF_BATCH_SIZE', 2)
+    tx_hashes = [f'{n:02x}' * 32 for n in range(5)]
+    # Batches are [tx0, tx1], [tx2, tx3] and [tx4]
+    wanted = {tx_hash: 100 + n for n, tx_hash in enumerate(tx_hashes)}
+    branch = [bytes(range(32)), bytes(range(32, 64))]
+    proof = {'merkle': [hash_to_hex_str(item) for item in branch], 'pos': 1}
+
+    def header(tx_hash):
+        merkle_root = _root_from_proof(hex_str_to_hash(tx_hash), branch, 1)
+        return SimpleNamespace(merkle_root=merkle_root, timestamp=1234, hash=bytes(32))
+
+    headers = {height: header(tx_hash) for tx_hash, height in wanted.items()}
+    # tx3's block has a different merkle root, so its proof is invalid
+    headers[103] = header(tx_hashes[0])
+
+    async def request_proofs(pairs):
+        if pairs[0][0] == tx_hashes[4]:
+            raise TaskTimeout(1)
+        return [RPCError(1, 'no proof') if tx_hash == tx_hashes[1] else proof
+                for tx_hash, _height in pairs]
+
+    async def headers_at_heights(heights):
+        return {height: headers[height] for height in heights}
+
+    session = SimpleNamespace(logger=logs.get_logger('test_network'),
+                              request_proofs=request_proofs,
+                              headers_at_heights=headers_at_heights)
+
+    async def main_session():
+        return session
+
+    verified = []
+    wallet = SimpleNamespace(unverified_transactions=lambda: wanted,
+                             add_verified_tx=lambda *args: verified.append(args))
+    network = Network.__new__(Network)
+    network._main_session = main_session
+
+    had_timeout = asyncio.get_event_loop().run_until_complete(network._request_proofs(wallet))
+    assert had_timeout
+    assert sorted(verified) == [(tx_hashes[0], 100, 1234, 1, 1, branch),
+                                (tx_hashes[2], 102, 1234, 1, 1, branch)]